@@ -1,8 +1,10 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
 from routers import problems, solutions, feedback, sessions  
 
-app = FastAPI(title="Parsons Problem Tutor API")
+app = FastAPI(title="Parsons Problem Tutor API", default_response_class=ORJSONResponse)
 
 # Setup CORS
 origins = [
@@ -19,6 +21,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress larger responses (session lists, stats, ProgSnap2 CSV export)
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
 # Add a health check endpoint
 @app.get("/health")
 async def health():
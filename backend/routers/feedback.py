@@ -30,7 +30,7 @@ async def get_feedback(request: FeedbackRequest):
                 "rawLogErrors": request.errorContext.rawLogErrors
             }
         
-        feedback = generate_feedback(
+        feedback = await generate_feedback(
             problem["parsonsSettings"], 
             request.userSolution,
             error_context
@@ -2,12 +2,17 @@
 
 from fastapi.responses import StreamingResponse
 from fastapi import APIRouter, HTTPException
-import io
-import json
+import asyncio
+import heapq
 import os
+import orjson
 from datetime import datetime
 from typing import Optional
-from services.progsnap2_export import export_to_progsnap2
+from services.progsnap2_export import iter_progsnap2_rows
+from services.session_cache import (
+    iter_sessions, atomic_write,
+    scan_session_entries, summarize_session, update_index, load_index
+)
 from models import SessionSnapshot
 
 # Use local path for development, Azure path for production
@@ -21,45 +26,60 @@ else:
 # Ensure data directory exists
 os.makedirs(DATA_DIR, exist_ok=True)
 
+# Upper bounds for a single saved snapshot
+MAX_SESSION_EVENTS = 10_000
+MAX_SESSION_BYTES = 2_000_000
+
 router = APIRouter()
 
 @router.post("")
 async def save_session(snapshot: SessionSnapshot):
     try:
-        filename = f"{DATA_DIR}/{snapshot.sessionId}.json"
+        # Names starting with '_' are reserved for the index and skipped by scans
+        if snapshot.sessionId.startswith('_'):
+            raise HTTPException(status_code=400, detail="sessionId must not start with '_'")
+        if len(snapshot.events) > MAX_SESSION_EVENTS:
+            raise HTTPException(status_code=413, detail=f"Too many events (maximum {MAX_SESSION_EVENTS})")
+        
+        filename = os.path.join(DATA_DIR, f"{snapshot.sessionId}.json")
         data = snapshot.dict()
         data['savedAt'] = datetime.now().isoformat()
-        with open(filename, 'w') as f:
-            json.dump(data, f, indent=2)
+        data['_summary'] = summarize_session(data)
+        data_bytes = orjson.dumps(data, option=orjson.OPT_INDENT_2)
+        if len(data_bytes) > MAX_SESSION_BYTES:
+            raise HTTPException(status_code=413, detail=f"Session payload too large (maximum {MAX_SESSION_BYTES} bytes)")
+        
+        # Blocking disk writes run off the event loop
+        st = await asyncio.to_thread(atomic_write, filename, data_bytes)
+        await asyncio.to_thread(update_index, DATA_DIR, snapshot.sessionId, data['_summary'], st)
         return {"message": "Session saved successfully", "sessionId": snapshot.sessionId}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to save session: {str(e)}")
 
+def scan_sessions(school: Optional[str] = None):
+    """
+    Yield parsed sessions one at a time, optionally filtered by school.
+    Files are read a small window ahead and not kept in the session cache.
+    """
+    for _, session in iter_sessions(scan_session_entries(DATA_DIR)):
+        # Filter by school if specified
+        if school and session.get('schoolId') != school:
+            continue
+        
+        yield session
+
 @router.get("/export/progsnap2")
 async def export_progsnap2(school: Optional[str] = None):
     """Export all sessions as ProgSnap2 MainTable.csv"""
     try:
-        # Load all sessions
-        sessions = []
-        for filename in os.listdir(DATA_DIR):
-            if not filename.endswith('.json'):
-                continue
-
-            with open(f"{DATA_DIR}/{filename}", 'r') as f:
-                session = json.load(f)
-            
-            # Filter by school if specified
-            if school and session.get('schoolId') != school:
-                continue
-            
-            sessions.append(session)
-        
-        # Convert to ProgSnap2 format
-        csv_content = export_to_progsnap2(sessions)
+        # Sessions are loaded and converted lazily as the response is sent
+        rows = iter_progsnap2_rows(scan_sessions(school))
         
         # Return as downloadable file
         return StreamingResponse(
-            io.StringIO(csv_content),
+            rows,
             media_type="text/csv",
             headers={
                 "Content-Disposition": f"attachment; filename=parsons-data-progsnap2.csv"
@@ -72,21 +92,14 @@ async def export_progsnap2(school: Optional[str] = None):
 async def get_stats_summary():
     """Get session statistics summary"""
     try:
-        # Load all sessions
-        sessions = []
-        
+        # Precomputed per-session summaries
         if not os.path.exists(DATA_DIR):
             os.makedirs(DATA_DIR, exist_ok=True)
             
-        for filename in os.listdir(DATA_DIR):
-            if not filename.endswith('.json'):
-                continue
-                
-            with open(f"{DATA_DIR}/{filename}", 'r') as f:
-                session = json.load(f)
-                sessions.append(session)
-        
-        if not sessions:
+        index = await asyncio.to_thread(load_index, DATA_DIR)
+        summaries = list(index.values())
+        
+        if not summaries:
             return {
                 "total_sessions": 0,
                 "unique_students": 0,
@@ -98,24 +111,22 @@ async def get_stats_summary():
             }
         
         # Calculate stats
-        total_sessions = len(sessions)
-        unique_students = len(set(s.get('studentId', 'unknown') for s in sessions))
-        unique_schools = len(set(s.get('schoolId', 'unknown') for s in sessions))
+        total_sessions = len(summaries)
+        unique_students = len(set(s['studentId'] for s in summaries))
+        unique_schools = len(set(s['schoolId'] for s in summaries))
         
-        total_events = sum(len(s.get('events', [])) for s in sessions)
+        total_events = sum(s['eventCount'] for s in summaries)
         avg_events = total_events / total_sessions if total_sessions > 0 else 0
         
         # Count completed sessions
-        completed_sessions = sum(1 for s in sessions 
-                               if any(e.get('type') == 'problem_solved' 
-                                     for e in s.get('events', [])))
+        completed_sessions = sum(1 for s in summaries if s['completed'])
         
         completion_rate = completed_sessions / total_sessions if total_sessions > 0 else 0
         
         # Sessions by school
         by_school = {}
-        for session in sessions:
-            school = session.get('schoolId', 'unknown')
+        for summary in summaries:
+            school = summary['schoolId']
             by_school[school] = by_school.get(school, 0) + 1
         
         return {
@@ -135,41 +146,34 @@ async def get_stats_summary():
 async def get_sessions(school: Optional[str] = None):
     """Get list of sessions with optional school filter"""
     try:
-        sessions = []
-        
         if not os.path.exists(DATA_DIR):
             return []
-            
-        for filename in os.listdir(DATA_DIR):
-            if not filename.endswith('.json'):
-                continue
-                
-            with open(f"{DATA_DIR}/{filename}", 'r') as f:
-                session = json.load(f)
-                
-                # Filter by school if specified
-                if school and session.get('schoolId') != school:
-                    continue
-                
-                # Extract summary
-                events = session.get('events', [])
-                start_time = events[0]['time'] if events else 0
-                end_time = events[-1]['time'] if events else start_time
-                
-                sessions.append({
-                    "sessionId": session.get('sessionId', filename.replace('.json', '')),
-                    "studentId": session.get('studentId', 'unknown'),
-                    "problemId": session.get('problemId', 'unknown'),
-                    "schoolId": session.get('schoolId', 'unknown'),
-                    "startTime": start_time,
-                    "endTime": end_time,
-                    "eventCount": len(events),
-                    "features": session.get('features', {})
-                })
-        
-        # Sort by start time (most recent first)
-        sessions.sort(key=lambda x: x['startTime'], reverse=True)
-        return sessions[:50]  # Limit to 50 most recent
+        
+        index = await asyncio.to_thread(load_index, DATA_DIR)
+        
+        # Filter by school if specified
+        session_ids = (
+            sid for sid, summary in index.items()
+            if not school or summary['schoolId'] == school
+        )
+        
+        # 50 most recent by start time, without sorting the whole index
+        recent_ids = heapq.nlargest(50, session_ids, key=lambda sid: index[sid]['startTime'])
+        
+        sessions = []
+        for sid in recent_ids:
+            summary = index[sid]
+            sessions.append({
+                "sessionId": sid,
+                "studentId": summary['studentId'],
+                "problemId": summary['problemId'],
+                "schoolId": summary['schoolId'],
+                "startTime": summary['startTime'],
+                "endTime": summary['endTime'],
+                "eventCount": summary['eventCount'],
+                "features": summary['features']
+            })
+        return sessions
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching sessions: {str(e)}")
\ No newline at end of file
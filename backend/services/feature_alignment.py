@@ -5,7 +5,6 @@ Simple feature alignment between iSNAP and Parsons
 Just normalize to 0-1 range
 """
 
-from sklearn.preprocessing import MinMaxScaler
 import numpy as np
 from typing import List, Dict, Tuple
 
@@ -34,24 +33,29 @@ def align_features(
     isnap_matrix = dict_list_to_matrix(isnap_features, feature_names)
     parsons_matrix = dict_list_to_matrix(parsons_features, feature_names)
     
-    # Fit scaler on combined data
-    combined = np.vstack([isnap_matrix, parsons_matrix])
-    scaler = MinMaxScaler()
-    scaler.fit(combined)
+    # Min/max over both datasets combined (same as MinMaxScaler on the
+    # stacked data, NaNs ignored, constant columns map to 0)
+    data_min = np.fmin(np.nanmin(isnap_matrix, axis=0), np.nanmin(parsons_matrix, axis=0))
+    data_max = np.fmax(np.nanmax(isnap_matrix, axis=0), np.nanmax(parsons_matrix, axis=0))
+    data_range = data_max - data_min
+    data_range[data_range == 0] = 1
     
     # Normalize both datasets
-    isnap_normalized = scaler.transform(isnap_matrix)
-    parsons_normalized = scaler.transform(parsons_matrix)
+    isnap_normalized = (isnap_matrix - data_min) / data_range
+    parsons_normalized = (parsons_matrix - data_min) / data_range
     
     return isnap_normalized, parsons_normalized, feature_names
 
 def dict_list_to_matrix(feature_dicts: List[Dict], feature_names: List[str]) -> np.ndarray:
-    """Convert list of feature dicts to numpy matrix"""
-    matrix = []
-    for features in feature_dicts:
-        row = [features.get(name, 0) for name in feature_names]
-        matrix.append(row)
-    return np.array(matrix)
+    """Convert list of feature dicts to numpy matrix (missing/None -> 0)"""
+    n = len(feature_dicts)
+    matrix = np.empty((n, len(feature_names)), dtype=np.float64)
+    for j, name in enumerate(feature_names):
+        matrix[:, j] = np.fromiter(
+            (features.get(name) or 0 for features in feature_dicts),
+            dtype=np.float64, count=n
+        )
+    return matrix
 
 def check_alignment(isnap_features: np.ndarray, parsons_features: np.ndarray):
     """Quick sanity check - print means and stds"""
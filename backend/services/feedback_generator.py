@@ -1,8 +1,11 @@
+import functools
 import os
 import openai
+from collections import OrderedDict
 from dotenv import load_dotenv
 from pathlib import Path
-from typing import Dict, List, Any
+from string import Template
+from typing import Dict, List, Any, Hashable, Optional, Tuple
 
 # Get the current file's directory
 current_dir = Path(__file__).parent
@@ -16,78 +19,46 @@ load_dotenv(dotenv_path=dotenv_path)
 # Configure OpenAI API
 openai.api_key = os.getenv("OPENAI_API_KEY")
 
-def generate_feedback(problem_settings: Dict[str, Any], user_solution: List[str], error_context: Dict[str, Any] = None) -> str:
-    """
-    Generates Socratic feedback for a student's solution attempt using AI.
-    
-    Args:
-        problem_settings: The ParsonsSettings of the problem
-        user_solution: The user's submitted solution as a list of code lines
-        error_context: Information about the specific error from the widget
-    
-    Returns:
-        A string containing Socratic-style feedback
-    """
-    # Extract the correct solution and user solution
-    initial_code = problem_settings["initial"]
-    correct_lines = [line for line in initial_code.split('\n') if line.strip() and '#distractor' not in line]
-    
-    # Clean user solution lines
-    cleaned_user_solution = [line.strip() for line in user_solution if line.strip()]
-    
-    # If no OpenAI API key is available, use a fallback method
-    if not openai.api_key:
-        return generate_fallback_feedback(correct_lines, cleaned_user_solution, error_context)
-    
-    try:
-        # ✅ ENHANCED: Include error context in prompt
-        error_info = ""
-        if error_context:
-            error_type = error_context.get('errorType', 'unknown')
-            error_lines = error_context.get('errorLines', [])
-            widget_message = error_context.get('widgetMessage', '')
-            
-            if error_type == 'incorrectPosition' and error_lines:
-                error_info = f"""
-                
-        The widget detected that line {error_lines[0]} is in the wrong position.
-        The widget told the student: "{widget_message}"
-        
-        Focus your Socratic questioning on helping them understand the logical order of operations.
-        Ask them to think about what should happen before and after this step.
-                """
-            elif error_type == 'incorrectIndent' and error_lines:
-                error_info = f"""
-                
-        The widget detected that line {error_lines[0]} has incorrect indentation.
-        The widget told the student: "{widget_message}"
-        
-        Focus your Socratic questioning on helping them understand Python's indentation rules and code block structure.
-                """
-            elif error_type == 'tooFewLines':
-                error_info = f"""
-                
-        The widget detected that the student's solution has too few lines.
-        The widget told the student: "{widget_message}"
-        
-        Focus your Socratic questioning on helping them identify missing code blocks.
-                """
+# One shared async client so connections are reused across requests
+_client = openai.AsyncOpenAI(api_key=openai.api_key) if openai.api_key else None
+
+# Memoized AI feedback for identical attempts (e.g. a student resubmitting the same answer)
+_FEEDBACK_CACHE: "OrderedDict[Hashable, str]" = OrderedDict()
+_FEEDBACK_CACHE_SIZE = 1024
+
+def _feedback_cache_key(correct_lines: List[str], user_solution: List[str], error_context: Optional[Dict[str, Any]]) -> Hashable:
+    """Key on exactly the inputs that go into the prompt"""
+    if not error_context:
+        return (tuple(correct_lines), tuple(user_solution), None)
+    return (
+        tuple(correct_lines),
+        tuple(user_solution),
+        error_context.get('errorType', 'unknown'),
+        tuple(error_context.get('errorLines', [])),
+        error_context.get('widgetMessage', '')
+    )
 
-        # Create a prompt for the AI
-        prompt = f"""
+def _cache_feedback(key: Hashable, feedback: str):
+    _FEEDBACK_CACHE[key] = feedback
+    _FEEDBACK_CACHE.move_to_end(key)
+    if len(_FEEDBACK_CACHE) > _FEEDBACK_CACHE_SIZE:
+        _FEEDBACK_CACHE.popitem(last=False)
+
+# Prompt pieces are parsed once at import; each request only fills the slots
+_PROMPT_TEMPLATE = Template("""
         I'm helping a student learn programming through Parsons problems (code reordering exercises).
         
         The correct solution is:
         ```python
-        {"\n".join(correct_lines)}
+        $correct
         ```
         
         The student's current attempt is:
         ```python
-        {"\n".join(cleaned_user_solution)}
+        $user
         ```
         
-        {error_info}
+        $error_info
         
         Please provide Socratic-style feedback - guide the student with questions rather than giving away the answer.
         Focus on the specific error type mentioned above and help them discover the issue through questioning.
@@ -98,11 +69,96 @@ def generate_feedback(problem_settings: Dict[str, Any], user_solution: List[str]
         - Focus on the specific error mentioned in the error context
         - Be encouraging and positive
         - Keep your response brief and targeted (2-3 sentences, with 1-2 questions)
-        """
+        """)
+
+# Extra prompt context per widget error type
+_ERROR_INFO_TEMPLATES = {
+    'incorrectPosition': Template("""
+                
+        The widget detected that line $line is in the wrong position.
+        The widget told the student: "$message"
+        
+        Focus your Socratic questioning on helping them understand the logical order of operations.
+        Ask them to think about what should happen before and after this step.
+                """),
+    'incorrectIndent': Template("""
+                
+        The widget detected that line $line has incorrect indentation.
+        The widget told the student: "$message"
+        
+        Focus your Socratic questioning on helping them understand Python's indentation rules and code block structure.
+                """),
+    'tooFewLines': Template("""
+                
+        The widget detected that the student's solution has too few lines.
+        The widget told the student: "$message"
+        
+        Focus your Socratic questioning on helping them identify missing code blocks.
+                """),
+}
+
+# Error types whose context refers to a specific line
+_LINE_ERROR_TYPES = ('incorrectPosition', 'incorrectIndent')
+
+def _error_info(error_context: Optional[Dict[str, Any]]) -> str:
+    """Error-specific prompt context, or "" if there is none to add"""
+    if not error_context:
+        return ""
+    
+    error_type = error_context.get('errorType', 'unknown')
+    error_lines = error_context.get('errorLines', [])
+    template = _ERROR_INFO_TEMPLATES.get(error_type)
+    if template is None or (error_type in _LINE_ERROR_TYPES and not error_lines):
+        return ""
+    
+    return template.substitute(
+        line=error_lines[0] if error_lines else '',
+        message=error_context.get('widgetMessage', '')
+    )
+
+@functools.lru_cache(maxsize=1024)
+def _correct_lines(initial_code: str) -> Tuple[str, ...]:
+    """Solution lines of a problem's initial code, without distractors"""
+    return tuple(line for line in initial_code.split('\n') if line.strip() and '#distractor' not in line)
+
+async def generate_feedback(problem_settings: Dict[str, Any], user_solution: List[str], error_context: Dict[str, Any] = None) -> str:
+    """
+    Generates Socratic feedback for a student's solution attempt using AI.
+    
+    Args:
+        problem_settings: The ParsonsSettings of the problem
+        user_solution: The user's submitted solution as a list of code lines
+        error_context: Information about the specific error from the widget
+    
+    Returns:
+        A string containing Socratic-style feedback
+    """
+    # Extract the correct solution and user solution
+    correct_lines = _correct_lines(problem_settings["initial"])
+    
+    # Clean user solution lines
+    cleaned_user_solution = [line.strip() for line in user_solution if line.strip()]
+    
+    # If no OpenAI API key is available, use a fallback method
+    if _client is None:
+        return generate_fallback_feedback(correct_lines, cleaned_user_solution, error_context)
+    
+    cache_key = _feedback_cache_key(correct_lines, cleaned_user_solution, error_context)
+    cached = _FEEDBACK_CACHE.get(cache_key)
+    if cached is not None:
+        _FEEDBACK_CACHE.move_to_end(cache_key)
+        return cached
+    
+    try:
+        # ✅ ENHANCED: Include error context in prompt
+        prompt = _PROMPT_TEMPLATE.substitute(
+            correct="\n".join(correct_lines),
+            user="\n".join(cleaned_user_solution),
+            error_info=_error_info(error_context)
+        )
         
         # Call the OpenAI API
-        client = openai.OpenAI()
-        response = client.chat.completions.create(
+        response = await _client.chat.completions.create(
             model="gpt-3.5-turbo",  # Can be configured based on needs
             messages=[
                 {"role": "system", "content": "You are a helpful programming tutor using the Socratic method."},
@@ -110,10 +166,12 @@ def generate_feedback(problem_settings: Dict[str, Any], user_solution: List[str]
             ],
             max_tokens=200,  # Keep responses concise
             temperature=0.7,  # Some creativity but not too random
+            timeout=10,
         )
         
         # Extract and return the generated feedback
         feedback = response.choices[0].message.content.strip()
+        _cache_feedback(cache_key, feedback)
         return feedback
     
     except Exception as e:
@@ -121,6 +179,17 @@ def generate_feedback(problem_settings: Dict[str, Any], user_solution: List[str]
         print(f"OpenAI API error: {str(e)}")
         return generate_fallback_feedback(correct_lines, cleaned_user_solution, error_context)
 
+# Fallback hints per widget error type; each takes the error line numbers
+_FALLBACK_BY_TYPE = {
+    'incorrectPosition': lambda error_lines: f"I notice that line {error_lines[0]} might not be in the right place. What should happen before this step in your program?",
+    'incorrectIndent': lambda error_lines: f"I notice line {error_lines[0]} has an indentation issue. In Python, which lines should be indented together as a group?",
+    'tooFewLines': lambda error_lines: "It looks like you might be missing some code blocks. Have you included all the necessary statements for this program?",
+    'tooManyLines': lambda error_lines: "It seems like you might have extra code blocks. Are all the lines you've included necessary for this program?",
+}
+
+# Substrings that mark a control structure line
+_CONTROL_KEYWORDS = ("if", "for", "while", "def")
+
 def generate_fallback_feedback(correct_lines: List[str], user_solution: List[str], error_context: Dict[str, Any] = None) -> str:
     """
     Generates simple feedback without using AI when the API is unavailable.
@@ -138,14 +207,9 @@ def generate_fallback_feedback(correct_lines: List[str], user_solution: List[str
         error_type = error_context.get('errorType', 'unknown')
         error_lines = error_context.get('errorLines', [])
         
-        if error_type == 'incorrectPosition' and error_lines:
-            return f"I notice that line {error_lines[0]} might not be in the right place. What should happen before this step in your program?"
-        elif error_type == 'incorrectIndent' and error_lines:
-            return f"I notice line {error_lines[0]} has an indentation issue. In Python, which lines should be indented together as a group?"
-        elif error_type == 'tooFewLines':
-            return "It looks like you might be missing some code blocks. Have you included all the necessary statements for this program?"
-        elif error_type == 'tooManyLines':
-            return "It seems like you might have extra code blocks. Are all the lines you've included necessary for this program?"
+        handler = _FALLBACK_BY_TYPE.get(error_type)
+        if handler and (error_lines or error_type not in _LINE_ERROR_TYPES):
+            return handler(error_lines)
     
     # ✅ FALLBACK: Generic feedback when no error context
     if len(user_solution) != len(correct_lines):
@@ -159,7 +223,7 @@ def generate_fallback_feedback(correct_lines: List[str], user_solution: List[str
                 return "I'm looking at the very first line of your solution. Is this the right place to start? What should happen first in this program?"
             
             # Check if it's a control structure mismatch
-            if any(keyword in correct_line for keyword in ["if", "for", "while", "def"]):
+            if any(keyword in correct_line for keyword in _CONTROL_KEYWORDS):
                 return f"Take a look at line {i+1} of your solution. Should this be a control structure? What would be the logical flow at this point in the program?"
             
             # Check if it's likely a logic/algorithm step
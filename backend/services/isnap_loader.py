@@ -5,10 +5,27 @@ Simple iSNAP data loader
 Manual download from PSLC DataShop, then parse
 """
 
+import importlib.util
+import numpy as np
 import pandas as pd
-from typing import List, Dict
+from typing import List, Dict, Optional
 import json
 
+try:
+    import orjson
+except ImportError:  # Fall back to stdlib json
+    orjson = None
+
+# pyarrow's multithreaded CSV reader is much faster on large TSV exports
+_HAS_PYARROW = importlib.util.find_spec('pyarrow') is not None
+
+# Columns parse_sessions reads; the rest of the export is skipped while parsing
+ISNAP_COLUMNS = [
+    'Session Id', 'Time', 'Action', 'Selection', 'Step Name',
+    'Student Response Type', 'CF (AST)', 'Feedback Text',
+    'Anon Student Id', 'Problem Name'
+]
+
 def load_isnap_data(filepath='data/isnap/polygonmakerLab.tsv'):
     """
     Load manually downloaded iSNAP data
@@ -16,11 +33,21 @@ def load_isnap_data(filepath='data/isnap/polygonmakerLab.tsv'):
     Download from: https://pslcdatashop.web.cmu.edu/DatasetInfo?datasetId=321
     Export as tab-delimited and save to filepath
     """
-    df = pd.read_csv(filepath, sep='\t')
+    df = pd.read_csv(
+        filepath,
+        sep='\t',
+        engine='pyarrow' if _HAS_PYARROW else 'c',
+        usecols=ISNAP_COLUMNS,
+        dtype={'Time': 'int64'}
+    )
     print(f"Loaded {len(df)} rows from iSNAP dataset")
     print(f"Columns: {df.columns.tolist()}")
     return df
 
+def _nullable(column: pd.Series) -> np.ndarray:
+    """Column values as an object array with missing values as None"""
+    return column.astype(object).where(column.notna(), None).to_numpy()
+
 def parse_sessions(df: pd.DataFrame) -> List[Dict]:
     """
     Group iSNAP data by session
@@ -29,41 +56,63 @@ def parse_sessions(df: pd.DataFrame) -> List[Dict]:
     """
     sessions = []
     
-    for session_id, group in df.groupby('Session Id'):
-        # Sort by time
-        group = group.sort_values('Time')
-        
-        # Extract events
-        events = []
-        for _, row in group.iterrows():
-            event = {
-                'time': int(row['Time']),
-                'action': row['Action'],
-                'selection': row['Selection'] if pd.notna(row['Selection']) else None,
-                'step_name': row['Step Name'],
-                'response_type': row['Student Response Type'],
-                'ast': row['CF (AST)'] if pd.notna(row['CF (AST)']) else None,
-                'feedback': row['Feedback Text'] if pd.notna(row['Feedback Text']) else None
+    # Sort by time once for all sessions; groups then come out already
+    # ordered, in session id order
+    df = df.sort_values(['Session Id', 'Time'], kind='stable')
+    
+    for session_id, group in df.groupby('Session Id', sort=False, observed=True):
+        # Extract events column-wise (one array per column, no per-row Series)
+        times = group['Time'].to_numpy()
+        events = [
+            {
+                'time': int(t),
+                'action': action,
+                'selection': selection,
+                'step_name': step_name,
+                'response_type': response_type,
+                'ast': ast,
+                'feedback': feedback
             }
-            events.append(event)
+            for t, action, selection, step_name, response_type, ast, feedback in zip(
+                times,
+                group['Action'].to_numpy(),
+                _nullable(group['Selection']),
+                group['Step Name'].to_numpy(),
+                group['Student Response Type'].to_numpy(),
+                _nullable(group['CF (AST)']),
+                _nullable(group['Feedback Text'])
+            )
+        ]
         
         session = {
             'session_id': session_id,
             'student_id': group.iloc[0]['Anon Student Id'],
             'problem_name': group.iloc[0]['Problem Name'],
             'events': events,
-            'start_time': int(group['Time'].min()),
-            'end_time': int(group['Time'].max())
+            'start_time': int(times.min()),
+            'end_time': int(times.max())
         }
         sessions.append(session)
     
     print(f"Parsed {len(sessions)} sessions")
     return sessions
 
-def save_parsed_sessions(sessions: List[Dict], output_file='data/isnap/parsed_sessions.json'):
-    """Save parsed sessions to JSON"""
-    with open(output_file, 'w') as f:
-        json.dump(sessions, f, indent=2)
+def save_parsed_sessions(
+    sessions: List[Dict],
+    output_file='data/isnap/parsed_sessions.json',
+    indent: Optional[int] = None
+):
+    """Save parsed sessions to JSON (compact by default; indent=2 for a readable file)"""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        if indent:
+            # orjson only supports two-space indentation
+            option |= orjson.OPT_INDENT_2
+        with open(output_file, 'wb') as f:
+            f.write(orjson.dumps(sessions, option=option))
+    else:
+        with open(output_file, 'w') as f:
+            json.dump(sessions, f, indent=indent, separators=None if indent else (',', ':'))
     print(f"Saved {len(sessions)} sessions to {output_file}")
 
 # Usage:
@@ -5,12 +5,38 @@ Simplified ProgSnap2 exporter - 8 essential columns
 """
 
 import csv
+import functools
 import io
-import json
-from typing import List, Dict, Any
+import orjson
+from typing import Dict, Any, Iterable, Iterator
 from datetime import datetime
 
-def export_to_progsnap2(sessions: List[Dict[str, Any]]) -> str:
+# Parsons event types -> ProgSnap2 standard
+EVENT_TYPE_MAP = {
+    'init': 'Session.Start',
+    'moveOutput': 'File.Edit',
+    'addOutput': 'File.Edit',
+    'removeOutput': 'File.Edit',
+    'moveInput': 'File.Edit',
+    'feedback': 'Run.Program',
+    'toggle': 'File.Edit',
+    'X-Hint.Widget': 'X-Hint.Widget',
+    'X-Hint.Socratic': 'X-Hint.Socratic',
+    'problem_solved': 'Session.End'
+}
+
+HINT_PREFIX = 'X-Hint.'
+
+# ':SS' and '.mmm000' (isoformat drops the fraction when it is zero)
+_SECOND_SUFFIXES = [f":{s:02d}" for s in range(60)]
+_MILLI_SUFFIXES = [''] + [f".{ms:03d}000" for ms in range(1, 1000)]
+
+FIELDNAMES = [
+    'EventType', 'SessionID', 'Order', 'SubjectID',
+    'ProblemID', 'CodeStateID', 'Timestamp', 'EventData', 'X-HintData'
+]
+
+def export_to_progsnap2(sessions: Iterable[Dict[str, Any]]) -> str:
     """
     Export sessions to ProgSnap2 MainTable.csv format
     
@@ -24,68 +50,90 @@ def export_to_progsnap2(sessions: List[Dict[str, Any]]) -> str:
     - Timestamp: When event occurred
     - EventData: Full event metadata (JSON)
     """
-    rows = []
+    return ''.join(iter_progsnap2_rows(sessions))
+
+def iter_progsnap2_rows(sessions: Iterable[Dict[str, Any]]) -> Iterator[str]:
+    """
+    Yield the ProgSnap2 CSV incrementally: the header, then one chunk of
+    rows per session. Only the session being converted is held in memory.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(FIELDNAMES)
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate(0)
     
     for session in sessions:
-        session_id = session['sessionId']
-        subject_id = session['studentId']
-        problem_id = session['problemId']
-        
-        for i, event in enumerate(session.get('events', [])):
-            # Map event type to ProgSnap2 standard
-            event_type = map_event_type(event['type'])
-            
-            # Timestamp
-            timestamp = datetime.fromtimestamp(event['time'] / 1000).isoformat()
-            
-            # Extract X-HintData for hint events
-            hint_data = ''
-            if event['type'].startswith('X-Hint.'):
-                metadata = event.get('metadata', {})
-                if 'X-HintData' in metadata:
-                    hint_data = json.dumps(metadata['X-HintData'])
-            
-            row = {
-                'EventType': event_type,
-                'SessionID': session_id,
-                'Order': i,
-                'SubjectID': subject_id,
-                'ProblemID': problem_id,
-                'CodeStateID': event.get('output', ''),
-                'Timestamp': timestamp,
-                'EventData': json.dumps(event),
-                'X-HintData': hint_data
-            }
-            rows.append(row)
-    
-    # Convert to CSV string
-    if not rows:
-        return "EventType,SessionID,Order,SubjectID,ProblemID,CodeStateID,Timestamp,EventData,X-HintData\n"
-    
-    output = io.StringIO()
-    fieldnames = [
-        'EventType', 'SessionID', 'Order', 'SubjectID', 
-        'ProblemID', 'CodeStateID', 'Timestamp', 'EventData', 'X-HintData'
-    ]
+        writer.writerows(_session_rows(session))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+
+def _session_rows(session: Dict[str, Any]) -> Iterator[tuple]:
+    """Yield one CSV row per event, in FIELDNAMES order"""
+    session_id = session['sessionId']
+    subject_id = session['studentId']
+    problem_id = session['problemId']
     
-    writer = csv.DictWriter(output, fieldnames=fieldnames)
-    writer.writeheader()
-    writer.writerows(rows)
+    for i, event in enumerate(session.get('events', [])):
+        raw_type = event['type']
+        
+        # Map event type to ProgSnap2 standard
+        event_type = EVENT_TYPE_MAP.get(raw_type, 'X-Unknown')
+        
+        # Timestamp
+        timestamp = format_timestamp(event['time'])
+        
+        # Serialize X-HintData once and splice the same bytes into EventData
+        hint_data = ''
+        event_data = event
+        if raw_type.startswith(HINT_PREFIX):
+            metadata = event.get('metadata', {})
+            if 'X-HintData' in metadata:
+                hint_json = orjson.dumps(metadata['X-HintData'])
+                hint_data = hint_json.decode()
+                event_data = {
+                    **event,
+                    'metadata': {**metadata, 'X-HintData': orjson.Fragment(hint_json)}
+                }
+        
+        yield (
+            event_type,
+            session_id,
+            i,
+            subject_id,
+            problem_id,
+            event.get('output', ''),
+            timestamp,
+            orjson.dumps(event_data).decode(),
+            hint_data
+        )
+
+def format_timestamp(ms) -> str:
+    """
+    Local-time ISO timestamp for a millisecond epoch time, identical to
+    datetime.fromtimestamp(ms / 1000).isoformat()
     
-    return output.getvalue()
+    Events in a session are seconds apart, so the date/hour/minute prefix is
+    formatted once per minute and the seconds come from lookup tables.
+    """
+    if type(ms) is int:
+        minute, ms_in_minute = divmod(ms, 60_000)
+        prefix = _minute_prefix(minute)
+        if prefix is not None:
+            seconds, millis = divmod(ms_in_minute, 1000)
+            return prefix + _SECOND_SUFFIXES[seconds] + _MILLI_SUFFIXES[millis]
+    return datetime.fromtimestamp(ms / 1000).isoformat()
+
+@functools.lru_cache(maxsize=4096)
+def _minute_prefix(minute: int):
+    """'YYYY-MM-DDTHH:MM' for an epoch minute, or None if the local UTC offset isn't whole minutes"""
+    start = datetime.fromtimestamp(minute * 60)
+    if start.second:
+        return None
+    return start.isoformat(timespec='minutes')
 
 def map_event_type(event_type: str) -> str:
     """Map Parsons event types to ProgSnap2 standard"""
-    mapping = {
-        'init': 'Session.Start',
-        'moveOutput': 'File.Edit',
-        'addOutput': 'File.Edit',
-        'removeOutput': 'File.Edit',
-        'moveInput': 'File.Edit',
-        'feedback': 'Run.Program',
-        'toggle': 'File.Edit',
-        'X-Hint.Widget': 'X-Hint.Widget',
-        'X-Hint.Socratic': 'X-Hint.Socratic',
-        'problem_solved': 'Session.End'
-    }
-    return mapping.get(event_type, 'X-Unknown')
\ No newline at end of file
+    return EVENT_TYPE_MAP.get(event_type, 'X-Unknown')
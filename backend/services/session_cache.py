@@ -0,0 +1,182 @@
+# backend/services/session_cache.py
+
+"""
+Session file storage helpers
+
+Maintains a sidecar index (sessionId -> summary) so list endpoints can
+answer from a single file instead of parsing every session. The parsed
+index is cached per process, keyed by mtime and size.
+"""
+
+import os
+import tempfile
+import threading
+import orjson
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+from typing import Dict, Any, Iterable, Iterator, Tuple
+
+INDEX_FILENAME = '_index.json'
+
+# path -> (mtime, size, parsed JSON); holds the index file
+_CACHE: Dict[str, Tuple[float, int, Any]] = {}
+
+# Serializes read-modify-write cycles on the index file
+_INDEX_LOCK = threading.Lock()
+
+# mkstemp creates files as 0600; written files get the mode open() would
+# give them. The umask can only be read by setting it, so do that once here.
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+FILE_MODE = 0o666 & ~_UMASK
+
+# Files read ahead by iter_sessions; bounds memory to this many parsed sessions
+PREFETCH_WINDOW = 16
+
+def _is_fresh(path: str, st: os.stat_result) -> bool:
+    hit = _CACHE.get(path)
+    return bool(hit) and hit[0] == st.st_mtime and hit[1] == st.st_size
+
+def _load(path: str, st: os.stat_result) -> Any:
+    if _is_fresh(path, st):
+        return _CACHE[path][2]
+
+    with open(path, 'rb') as f:
+        parsed = orjson.loads(f.read())
+    _CACHE[path] = (st.st_mtime, st.st_size, parsed)
+    return parsed
+
+def read_session(entry: os.DirEntry) -> Dict[str, Any]:
+    """Parsed session for a directory entry (not cached)"""
+    with open(entry.path, 'rb') as f:
+        return orjson.loads(f.read())
+
+def iter_sessions(entries: Iterable[os.DirEntry]) -> Iterator[Tuple[os.DirEntry, Dict[str, Any]]]:
+    """
+    Yield (entry, parsed session) in order, reading up to PREFETCH_WINDOW
+    files ahead on a thread pool. File reads and orjson parsing release the
+    GIL, so reads overlap on slow or networked disks while at most a window
+    of sessions is held in memory.
+    """
+    max_workers = min(PREFETCH_WINDOW, (os.cpu_count() or 1) * 4)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = deque()
+        for entry in entries:
+            pending.append((entry, executor.submit(read_session, entry)))
+            if len(pending) >= PREFETCH_WINDOW:
+                entry, future = pending.popleft()
+                yield entry, future.result()
+        while pending:
+            entry, future = pending.popleft()
+            yield entry, future.result()
+
+def invalidate(path: str):
+    """Drop the cached copy of a session file (call after writing it)"""
+    _CACHE.pop(path, None)
+
+def atomic_write(path: str, data: bytes) -> os.stat_result:
+    """
+    Write data to path via a temp file in the same directory, so readers
+    never see a partially written file
+
+    Returns the written file's stat, taken before the rename so it always
+    describes these bytes even if another writer replaces path right after.
+    """
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            os.fchmod(f.fileno(), FILE_MODE)
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+            st = os.fstat(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    invalidate(path)
+    return st
+
+def scan_session_entries(session_dir: str) -> Iterator[os.DirEntry]:
+    """Yield directory entries for session files, skipping the index"""
+    with os.scandir(session_dir) as it:
+        for entry in it:
+            if entry.name.endswith('.json') and not entry.name.startswith('_'):
+                yield entry
+
+def summarize_session(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Per-session values the list/stats endpoints need, computed once at save time"""
+    events = data.get('events', [])
+    return {
+        'eventCount': len(events),
+        'startTime': events[0]['time'] if events else 0,
+        'endTime': events[-1]['time'] if events else 0,
+        'completed': any(e.get('type') == 'problem_solved' for e in events),
+        'schoolId': data.get('schoolId', 'unknown'),
+        'studentId': data.get('studentId', 'unknown'),
+        'problemId': data.get('problemId', 'unknown'),
+        'features': data.get('features', {})
+    }
+
+def _read_index(index_path: str) -> Dict[str, Dict[str, Any]]:
+    try:
+        return _load(index_path, os.stat(index_path))
+    except (FileNotFoundError, orjson.JSONDecodeError):
+        return {}
+
+def _index_entry(summary: Dict[str, Any], st: os.stat_result) -> Dict[str, Any]:
+    """Summary plus the stat of the file it was taken from"""
+    return {**summary, '_mtime_ns': st.st_mtime_ns, '_size': st.st_size}
+
+def _is_current(entry: Dict[str, Any], st: os.stat_result) -> bool:
+    # Summaries written before features were indexed are treated as stale
+    return (
+        entry.get('_mtime_ns') == st.st_mtime_ns and entry.get('_size') == st.st_size
+        and 'features' in entry
+    )
+
+def update_index(session_dir: str, session_id: str, summary: Dict[str, Any], st: os.stat_result):
+    """
+    Record a session's summary in the sidecar index, along with the stat of
+    the file it describes (as returned by atomic_write)
+    """
+    index_path = os.path.join(session_dir, INDEX_FILENAME)
+    with _INDEX_LOCK:
+        index = dict(_read_index(index_path))
+        index[session_id] = _index_entry(summary, st)
+        atomic_write(index_path, orjson.dumps(index))
+
+def load_index(session_dir: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Return sessionId -> summary for every session file in session_dir.
+
+    Each entry is checked against its file's mtime/size, so a summary lost
+    to a concurrent index write (another worker process, or overlapping
+    saves of the same session) is re-read from the file rather than kept.
+    Files missing from the index are summarized and added; entries whose
+    file is gone are dropped.
+    """
+    index_path = os.path.join(session_dir, INDEX_FILENAME)
+    with _INDEX_LOCK:
+        index = _read_index(index_path)
+        stats = {
+            entry.name[:-len('.json')]: (entry, entry.stat())
+            for entry in scan_session_entries(session_dir)
+        }
+        stale = [
+            entry for sid, (entry, st) in stats.items()
+            if sid not in index or not _is_current(index[sid], st)
+        ]
+
+        if not stale and len(index) == len(stats):
+            return index
+
+        index = {sid: summary for sid, summary in index.items() if sid in stats}
+        for entry, session in iter_sessions(stale):
+            sid = entry.name[:-len('.json')]
+            summary = session.get('_summary')
+            if not summary or 'features' not in summary:
+                summary = summarize_session(session)
+            index[sid] = _index_entry(summary, stats[sid][1])
+        atomic_write(index_path, orjson.dumps(index))
+        return index
@@ -2,46 +2,117 @@
 
 """Simple session validation - pass/fail only"""
 
+import functools
 import numpy as np
 from typing import List, Dict, Tuple
 
+# Fixed issue categories; each issue is reported as (code, message)
+ISSUE_CODES = (
+    'TOO_FEW_EVENTS', 'TOO_MANY_EVENTS', 'MISSING_FEATURE',
+    'NULL_FEATURE', 'NAN_INF', 'MISSING_STATE_HISTORY'
+)
+_ISSUE_INDEX = {code: i for i, code in enumerate(ISSUE_CODES)}
+
+REQUIRED_FEATURES = (
+    'totalTime', 'manipulationCount', 'feedbackCount',
+    'uniqueStates', 'successRate', 'consecutiveFailures'
+)
+
 def validate_session(session: Dict) -> Tuple[bool, List[str]]:
     """
     Simple validation - yes/no
     Returns (is_valid, list_of_issues)
     """
+    issues = [message for _, message in _coded_issues(session)]
+    return len(issues) == 0, issues
+
+def _coded_issues(session: Dict) -> List[Tuple[str, str]]:
+    """(code, message) pairs for every failed check"""
+    n_events = len(session.get('events', []))
+    has_history = 'stateHistory' in session
+    features = session.get('features', {})
+    
+    # Results are reused for sessions with the same event count, history
+    # flag and feature values; anything unhashable skips the cache
+    try:
+        return list(_cached_issues(n_events, has_history, tuple(features.items())))
+    except TypeError:
+        return _session_issues(n_events, has_history, features)
+
+@functools.lru_cache(maxsize=8192)
+def _cached_issues(n_events: int, has_history: bool, feature_items: Tuple) -> Tuple[Tuple[str, str], ...]:
+    return tuple(_session_issues(n_events, has_history, dict(feature_items)))
+
+def _session_issues(n_events: int, has_history: bool, features: Dict) -> List[Tuple[str, str]]:
     issues = []
     
     # Check 1: Has enough events
-    events = session.get('events', [])
-    if len(events) < 5:
-        issues.append(f"Too few events: {len(events)} (minimum 5)")
-    elif len(events) > 500:
-        issues.append(f"Too many events: {len(events)} (maximum 500, possible error)")
+    if n_events < 5:
+        issues.append(("TOO_FEW_EVENTS", f"Too few events: {n_events} (minimum 5)"))
+    elif n_events > 500:
+        issues.append(("TOO_MANY_EVENTS", f"Too many events: {n_events} (maximum 500, possible error)"))
     
     # Check 2: Has all required features
-    features = session.get('features', {})
-    required = [
-        'totalTime', 'manipulationCount', 'feedbackCount', 
-        'uniqueStates', 'successRate', 'consecutiveFailures'
-    ]
-    for feature in required:
+    for feature in REQUIRED_FEATURES:
         if feature not in features:
-            issues.append(f"Missing feature: {feature}")
+            issues.append(("MISSING_FEATURE", f"Missing feature: {feature}"))
     
-    # Check 3: No NaN/Inf values
+    # Check 3: No NaN/Inf values (one vectorized check over all numeric features)
+    numeric = []
     for feature, value in features.items():
         if value is None:
-            issues.append(f"Null feature: {feature}")
+            issues.append(("NULL_FEATURE", f"Null feature: {feature}"))
         elif isinstance(value, (int, float)):
-            if np.isnan(value) or np.isinf(value):
-                issues.append(f"Invalid value for {feature}: {value}")
+            numeric.append((feature, value))
+    
+    if numeric:
+        values = np.fromiter((value for _, value in numeric), dtype=np.float64, count=len(numeric))
+        for i in np.flatnonzero(~np.isfinite(values)):
+            feature, value = numeric[i]
+            issues.append(("NAN_INF", f"Invalid value for {feature}: {value}"))
     
     # Check 4: stateHistory exists
-    if 'stateHistory' not in session:
-        issues.append("Missing stateHistory")
+    if not has_history:
+        issues.append(("MISSING_STATE_HISTORY", "Missing stateHistory"))
     
-    return len(issues) == 0, issues
+    return issues
+
+def _flag_invalid(sessions: List[Dict]) -> np.ndarray:
+    """
+    Boolean mask of sessions that fail any validate_session check,
+    computed across the whole dataset at once
+    """
+    n = len(sessions)
+    
+    # Checks 1 and 4: event count range, stateHistory present
+    n_events = np.fromiter((len(s.get('events', [])) for s in sessions), dtype=np.int64, count=n)
+    has_history = np.fromiter(('stateHistory' in s for s in sessions), dtype=bool, count=n)
+    
+    # Check 2: required features present
+    feature_dicts = [s.get('features', {}) for s in sessions]
+    missing_feature = np.zeros(n, dtype=bool)
+    for feature in REQUIRED_FEATURES:
+        missing_feature |= np.fromiter((feature not in f for f in feature_dicts), dtype=bool, count=n)
+    
+    # Check 3: all feature values in one flat array tagged with their
+    # session index; None is stored as NaN so it fails the same test
+    owners = []
+    values = []
+    for i, features in enumerate(feature_dicts):
+        for value in features.values():
+            if value is None:
+                owners.append(i)
+                values.append(np.nan)
+            elif isinstance(value, (int, float)):
+                owners.append(i)
+                values.append(value)
+    
+    bad_value = np.zeros(n, dtype=bool)
+    if values:
+        not_finite = ~np.isfinite(np.array(values, dtype=np.float64))
+        bad_value[np.asarray(owners)[not_finite]] = True
+    
+    return (n_events < 5) | (n_events > 500) | ~has_history | missing_feature | bad_value
 
 def validate_dataset(sessions: List[Dict]) -> Dict:
     """
@@ -56,24 +127,25 @@ def validate_dataset(sessions: List[Dict]) -> Dict:
             'common_issues': []
         }
     
-    valid_count = 0
-    all_issues = []
+    # Screen every session with array ops, then collect detailed issues
+    # only for the sessions that failed
+    invalid_indices = np.flatnonzero(_flag_invalid(sessions))
+    valid_count = len(sessions) - len(invalid_indices)
+    issue_codes = []
     invalid_sessions = []
     
-    for session in sessions:
-        is_valid, issues = validate_session(session)
-        if is_valid:
-            valid_count += 1
-        else:
-            invalid_sessions.append({
-                'sessionId': session.get('sessionId'),
-                'issues': issues
-            })
-            all_issues.extend(issues)
-    
-    # Count common issues
-    from collections import Counter
-    issue_counts = Counter(all_issues)
+    for i in invalid_indices:
+        session = sessions[i]
+        issues = _coded_issues(session)
+        invalid_sessions.append({
+            'sessionId': session.get('sessionId'),
+            'issues': [message for _, message in issues]
+        })
+        issue_codes.extend(_ISSUE_INDEX[code] for code, _ in issues)
+    
+    # Count common issues by category
+    codes, counts = np.unique(np.array(issue_codes, dtype=np.int8), return_counts=True)
+    most_common = np.argsort(-counts, kind='stable')[:5]
     
     return {
         'total': len(sessions),
@@ -81,8 +153,8 @@ def validate_dataset(sessions: List[Dict]) -> Dict:
         'invalid': len(sessions) - valid_count,
         'pass_rate': valid_count / len(sessions),
         'common_issues': [
-            {'issue': issue, 'count': count}
-            for issue, count in issue_counts.most_common(5)
+            {'issue': ISSUE_CODES[codes[i]], 'count': int(counts[i])}
+            for i in most_common
         ],
         'invalid_sessions': invalid_sessions[:10]  # First 10 only
     }
\ No newline at end of file
@@ -5,10 +5,11 @@ Complete transfer learning experiment
 Run this after collecting both iSNAP and Parsons data
 """
 
-import json
 import numpy as np
+import orjson
 import sys
 import os
+from concurrent.futures import ThreadPoolExecutor
 
 # Add parent directories to path
 sys.path.append('backend')
@@ -17,6 +18,11 @@ from services.isnap_features import ISNAPFeatureExtractor
 from services.feature_alignment import align_features
 from training.pipeline import TransferLearningPipeline
 
+def load_session_features(path):
+    """Read one saved Parsons session and return its feature dict"""
+    with open(path, 'rb') as f:
+        return orjson.loads(f.read())['features']
+
 def create_struggle_labels(features_list):
     """
     Create struggle labels based on behavioral features
@@ -27,15 +33,13 @@ def create_struggle_labels(features_list):
     - High consecutive failures (>= 3)
     - High manipulation to feedback ratio (> 10)
     """
-    labels = []
-    for f in features_list:
-        is_struggling = (
-            f['successRate'] < 0.5 and
-            f['consecutiveFailures'] >= 3 and
-            f['manipulationToFeedbackRatio'] > 10
-        )
-        labels.append(1 if is_struggling else 0)
-    return np.array(labels)
+    n = len(features_list)
+    success_rate = np.fromiter((f['successRate'] for f in features_list), dtype=np.float64, count=n)
+    consecutive_failures = np.fromiter((f['consecutiveFailures'] for f in features_list), dtype=np.float64, count=n)
+    ratio = np.fromiter((f['manipulationToFeedbackRatio'] for f in features_list), dtype=np.float64, count=n)
+    
+    is_struggling = (success_rate < 0.5) & (consecutive_failures >= 3) & (ratio > 10)
+    return is_struggling.astype(int)
 
 def main():
     print("=" * 70)
@@ -59,14 +63,16 @@ def main():
     
     # Step 3: Load Parsons data
     print("\n[3/6] Loading Parsons data...")
-    parsons_features_list = []
     sessions_dir = 'backend/data/sessions'
-    for filename in os.listdir(sessions_dir):
-        if not filename.endswith('.json'):
-            continue
-        with open(f"{sessions_dir}/{filename}", 'r') as f:
-            session = json.load(f)
-            parsons_features_list.append(session['features'])
+    # Skip non-session files such as the _index.json summary sidecar
+    session_paths = [
+        os.path.join(sessions_dir, filename)
+        for filename in os.listdir(sessions_dir)
+        if filename.endswith('.json') and not filename.startswith('_')
+    ]
+    # Reads overlap across threads; each worker keeps only the features
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        parsons_features_list = list(executor.map(load_session_features, session_paths))
     print(f"Loaded {len(parsons_features_list)} Parsons sessions")
     
     # Step 4: Align features
@@ -121,11 +127,11 @@ def main():
     output_dir = 'ml/results'
     os.makedirs(output_dir, exist_ok=True)
     
-    with open(f'{output_dir}/transfer_learning_results.json', 'w') as f:
-        json.dump({
-            'baseline': {k: v for k, v in results['baseline'].items() if k != 'model'},
-            'transfer': {k: v for k, v in results['transfer'].items() if k != 'model'},
-            'joint': {k: v for k, v in results['joint'].items() if k != 'model'},
+    with open(f'{output_dir}/transfer_learning_results.json', 'wb') as f:
+        f.write(orjson.dumps({
+            'baseline': results['baseline'],
+            'transfer': results['transfer'],
+            'joint': results['joint'],
             'feature_importance': [
                 {'feature': f, 'importance': float(i)}
                 for f, i in feature_importance
@@ -136,7 +142,7 @@ def main():
                 'isnap_struggling': int(isnap_labels.sum()),
                 'parsons_struggling': int(parsons_labels.sum())
             }
-        }, f, indent=2)
+        }, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
     
     print(f"Results saved to {output_dir}/transfer_learning_results.json")
     print("\n✓ Experiment complete!")
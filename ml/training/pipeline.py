@@ -5,7 +5,8 @@ Transfer Learning Pipeline
 Compare three approaches: Baseline, Transfer, Joint
 """
 
-from sklearn.ensemble import RandomForestClassifier
+from sklearn.ensemble import HistGradientBoostingClassifier
+from sklearn.inspection import permutation_importance
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
 import numpy as np
@@ -23,6 +24,7 @@ class TransferLearningPipeline:
     def __init__(self, random_state=42):
         self.random_state = random_state
         self.results = {}
+        self.models = {}
     
     def prepare_data(
         self,
@@ -40,9 +42,21 @@ class TransferLearningPipeline:
             test_size=test_size, random_state=self.random_state
         )
         
-        # iSNAP data (all for pre-training)
-        self.X_isnap = isnap_features
-        self.y_isnap = isnap_labels
+        # iSNAP data (all for pre-training) and Parsons training data are views
+        # into one float32 buffer, which joint training uses without a copy.
+        # float32 halves the buffer; the boosting models bin it into uint8 histograms.
+        n_isnap = len(isnap_features)
+        n_features = np.shape(isnap_features)[1]
+        self.X_combined = np.empty((n_isnap + len(self.X_parsons_train), n_features), dtype=np.float32)
+        self.X_combined[:n_isnap] = isnap_features
+        self.X_combined[n_isnap:] = self.X_parsons_train
+        self.y_combined = np.concatenate([isnap_labels, self.y_parsons_train])
+        
+        self.X_isnap = self.X_combined[:n_isnap]
+        self.y_isnap = self.y_combined[:n_isnap]
+        self.X_parsons_train = self.X_combined[n_isnap:]
+        self.y_parsons_train = self.y_combined[n_isnap:]
+        self.X_parsons_test = np.ascontiguousarray(self.X_parsons_test, dtype=np.float32)
         
         print(f"Parsons train: {len(self.X_parsons_train)} samples")
         print(f"Parsons test: {len(self.X_parsons_test)} samples")
@@ -52,21 +66,11 @@ class TransferLearningPipeline:
         """Approach 1: Train only on Parsons data"""
         print("\n=== Training Baseline Model ===")
         
-        model = RandomForestClassifier(
-            n_estimators=100,
-            random_state=self.random_state
-        )
-        
+        model = self._make_model(len(self.X_parsons_train))
         model.fit(self.X_parsons_train, self.y_parsons_train)
         predictions = model.predict(self.X_parsons_test)
         
-        self.results['baseline'] = {
-            'model': model,
-            'accuracy': accuracy_score(self.y_parsons_test, predictions),
-            'precision': precision_score(self.y_parsons_test, predictions, zero_division=0),
-            'recall': recall_score(self.y_parsons_test, predictions, zero_division=0),
-            'f1': f1_score(self.y_parsons_test, predictions, zero_division=0)
-        }
+        self._record('baseline', model, predictions)
         
         print(f"Baseline Accuracy: {self.results['baseline']['accuracy']:.3f}")
         return model
@@ -77,27 +81,24 @@ class TransferLearningPipeline:
         
         # Step 1: Pre-train on iSNAP
         print("Pre-training on iSNAP data...")
-        pretrained = RandomForestClassifier(
-            n_estimators=100,
-            random_state=self.random_state,
-            warm_start=True
-        )
+        pretrained = self._make_model(len(self.X_isnap), warm_start=True)
         pretrained.fit(self.X_isnap, self.y_isnap)
         
         # Step 2: Fine-tune on Parsons
+        # warm_start keeps the iSNAP iterations and boosts further on Parsons data
         print("Fine-tuning on Parsons data...")
-        pretrained.n_estimators = 150
+        n_pretrained = pretrained.n_iter_
+        pretrained.set_params(
+            max_iter=pretrained.n_iter_ + 50,
+            min_samples_leaf=self._min_samples_leaf(len(self.X_parsons_train))
+        )
         pretrained.fit(self.X_parsons_train, self.y_parsons_train)
+        print(f"Iterations: {n_pretrained} pre-trained + "
+              f"{pretrained.n_iter_ - n_pretrained} fine-tuned")
         
         predictions = pretrained.predict(self.X_parsons_test)
         
-        self.results['transfer'] = {
-            'model': pretrained,
-            'accuracy': accuracy_score(self.y_parsons_test, predictions),
-            'precision': precision_score(self.y_parsons_test, predictions, zero_division=0),
-            'recall': recall_score(self.y_parsons_test, predictions, zero_division=0),
-            'f1': f1_score(self.y_parsons_test, predictions, zero_division=0)
-        }
+        self._record('transfer', pretrained, predictions)
         
         print(f"Transfer Accuracy: {self.results['transfer']['accuracy']:.3f}")
         return pretrained
@@ -106,28 +107,44 @@ class TransferLearningPipeline:
         """Approach 3: Train on combined iSNAP + Parsons data"""
         print("\n=== Training Joint Model ===")
         
-        # Combine training data
-        X_combined = np.vstack([self.X_isnap, self.X_parsons_train])
-        y_combined = np.concatenate([self.y_isnap, self.y_parsons_train])
+        model = self._make_model(len(self.X_combined))
         
-        model = RandomForestClassifier(
-            n_estimators=100,
-            random_state=self.random_state
-        )
-        
-        model.fit(X_combined, y_combined)
+        # Combined training data was laid out once in prepare_data
+        model.fit(self.X_combined, self.y_combined)
         predictions = model.predict(self.X_parsons_test)
         
-        self.results['joint'] = {
-            'model': model,
+        self._record('joint', model, predictions)
+        
+        print(f"Joint Accuracy: {self.results['joint']['accuracy']:.3f}")
+        return model
+    
+    @staticmethod
+    def _min_samples_leaf(n_samples: int) -> int:
+        """sklearn's default of 20, reduced for small training sets so trees can still split"""
+        return min(20, max(1, n_samples // 20))
+    
+    def _make_model(self, n_samples: int, **params) -> HistGradientBoostingClassifier:
+        return HistGradientBoostingClassifier(
+            max_iter=100,
+            learning_rate=0.1,
+            early_stopping='auto',
+            min_samples_leaf=self._min_samples_leaf(n_samples),
+            random_state=self.random_state,
+            **params
+        )
+    
+    def _record(self, approach: str, model, predictions: np.ndarray):
+        """
+        Store test-set metrics for an approach. The fitted model is kept in
+        self.models so feature importances can be computed on request.
+        """
+        self.models[approach] = model
+        self.results[approach] = {
             'accuracy': accuracy_score(self.y_parsons_test, predictions),
             'precision': precision_score(self.y_parsons_test, predictions, zero_division=0),
             'recall': recall_score(self.y_parsons_test, predictions, zero_division=0),
             'f1': f1_score(self.y_parsons_test, predictions, zero_division=0)
         }
-        
-        print(f"Joint Accuracy: {self.results['joint']['accuracy']:.3f}")
-        return model
     
     def compare_approaches(self):
         """Compare all three approaches"""
@@ -161,10 +178,13 @@ class TransferLearningPipeline:
         if approach not in self.results:
             raise ValueError(f"No results for approach: {approach}")
         
-        model = self.results[approach]['model']
-        importances = model.feature_importances_
-        
-        return importances
+        # Permutation importance on the Parsons test set
+        # (gradient boosting has no impurity-based feature_importances_)
+        result = permutation_importance(
+            self.models[approach], self.X_parsons_test, self.y_parsons_test,
+            n_repeats=5, random_state=self.random_state
+        )
+        return result.importances_mean
 
 # Usage:
 # pipeline = TransferLearningPipeline()